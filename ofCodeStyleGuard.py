@@ -3,8 +3,9 @@
 import styleguard
 import logging
 import json
+import math
 import os
-from flask import Flask, request
+from flask import Flask, request, jsonify
 
 WEBLOGGER = logging.getLogger('styleguard.webserver')
 WEBLOGGER.setLevel(styleguard.cfg['logging_level'])
@@ -20,7 +21,7 @@ styleguard.add_file_logger()
 def manual_check():
 	"""Initiate manual request for checking a PR"""
 	WEBLOGGER.info('Manual PR check has been requested')
-	WEBLOGGER.debug('Access route: ' + str(request.access_route[:]))
+	WEBLOGGER.debug('Access route: %s', request.access_route[:])
 	# get the number of the requested pr (i.e. URL/check?pr=number)
 	try:
 		pr_number = int(request.args.get('pr', 0))
@@ -28,7 +29,7 @@ def manual_check():
 		WEBLOGGER.error('Invalid PR ID! Skipping...')
 		return 'Error: Invalid PR ID!'
 	if pr_number:
-		WEBLOGGER.info('PR number ' + str(pr_number))
+		WEBLOGGER.info('PR number %s', pr_number)
 		styleguard.handle_payload(pr_number)
 		return ('Received request for checking PR ' + str(pr_number))
 	else:
@@ -36,19 +37,40 @@ def manual_check():
 		return 'Error: Invalid PR ID!'
 
 
+@APP.route('/status')
+def status():
+	"""Report state of the PR worker and startup metrics"""
+	return jsonify(styleguard.worker_status())
+
+
+@APP.route('/stats')
+def stats():
+	"""Report latency percentiles and throughput of recent runs"""
+	# time window in hours (i.e. URL/stats?hours=number)
+	try:
+		hours = float(request.args.get('hours', 24))
+	except ValueError:
+		WEBLOGGER.error('Invalid time window!')
+		return 'Error: Invalid time window!'
+	if math.isnan(hours) or math.isinf(hours) or hours <= 0:
+		WEBLOGGER.error('Invalid time window!')
+		return 'Error: Invalid time window!'
+	return jsonify(styleguard.HISTORY.stats(hours * 3600))
+
+
 @APP.route('/', methods=['POST'])
 def api_pr():
 	""" React to a received POST request"""
 	WEBLOGGER.info(60 * "#")
 	WEBLOGGER.info("Received POST request.")
-	WEBLOGGER.debug('Access route: ' + str(request.access_route[:]))
+	WEBLOGGER.debug('Access route: %s', request.access_route[:])
 	origin = request.access_route[0]
 	# was using request.remote_addr. access_route could possibly be spoofed
 	if origin not in styleguard.cfg['github_ips']:
-		WEBLOGGER.warning("Origin of request UNKNOWN: " + origin)
+		WEBLOGGER.warning("Origin of request UNKNOWN: %s", origin)
 		return 'Error'
 	else:
-		WEBLOGGER.debug("Origin of request: " + origin)
+		WEBLOGGER.debug("Origin of request: %s", origin)
 
 	try:
 		payload = json.loads(request.form['payload'])['pull_request']
@@ -66,9 +88,10 @@ def api_pr():
 
 def main():
 	"""Main function"""
-	# Instantiate a PrHandler, which start waiting on styleguard.MY_QUEUE
+	# Start a PrHandler, which initializes and waits on styleguard.MY_QUEUE
 	WEBLOGGER.debug('In ofCodeStyleGuard main function')
-	_threaded_pr_worker = styleguard.PrHandler()
+	styleguard.start_worker()
+	styleguard.record_startup('app_ready')
 	APP.run(host='0.0.0.0', port=styleguard.cfg['local_port'])
 	styleguard.MY_QUEUE.join()
 
@@ -1,5 +1,9 @@
 """Automatic mechanism to make sure code style of PRs is checked."""
 
+from time import sleep, time
+# Taken before the other imports, so that their cost counts towards startup
+START_TIME = time()
+
 import logging
 import json
 import threading
@@ -11,10 +15,13 @@ import github
 import Queue
 import errno
 import shutil
-from requests import Session, get
-from time import sleep
+import atexit
+from requests import Session, get, RequestException
 from styleguard_config import cfg
+from styleguard_history import RunHistory
 from stat import S_IEXEC
+from contextlib import contextmanager
+from hashlib import sha1
 from datetime import datetime
 from logging.handlers import TimedRotatingFileHandler
 
@@ -33,24 +40,140 @@ class LessThanLevelFilter(logging.Filter):  # pylint: disable=R0903
 		return (record.levelno < self.passlevel)
 
 
-LOGGER = logging.getLogger('styleguard')
+class ContextFilter(logging.Filter):  # pylint: disable=R0903
+	"""Attach the PR number and stage of the calling thread to records"""
+	def filter(self, record):
+		if not hasattr(record, 'pr'):
+			record.pr = getattr(LOG_CONTEXT, 'pr', None)
+		if not hasattr(record, 'stage'):
+			record.stage = getattr(LOG_CONTEXT, 'stage', None)
+		if not hasattr(record, 'duration'):
+			record.duration = None
+		return True
+
+
+class JsonFormatter(logging.Formatter):
+	"""Format records as one JSON object per line"""
+	def format(self, record):
+		entry = {'time': self.formatTime(record),
+				'level': record.levelname,
+				'logger': record.name,
+				'message': to_unicode(record.getMessage()),
+				'pr': getattr(record, 'pr', None),
+				'stage': getattr(record, 'stage', None),
+				'duration': getattr(record, 'duration', None)}
+		if record.exc_info:
+			entry['exception'] = to_unicode(self.formatException(record.exc_info))
+		return json.dumps(entry)
+
+
+def to_unicode(text):
+	"""Decode byte strings, e.g. subprocess output, so that they can be
+	dumped to JSON even if they are not valid UTF-8"""
+	if isinstance(text, str):
+		return text.decode('utf-8', 'replace')
+	return text
+
+
+class QueueHandler(logging.Handler):
+	"""Logging handler which only puts records on a queue.
+
+	The actual output is done by a LogWriter thread, so that the calling
+	thread never blocks on I/O. Message formatting is deferred to the writer,
+	so log arguments must not be mutated after the logging call."""
+	def __init__(self, queue):
+		# In python 2.6, logging.Handler is an old-style class
+		logging.Handler.__init__(self)
+		self.queue = queue
+		self.records = 0
+		self.handling_time = 0.0
+
+	def handle(self, record):
+		# No lock needed around emit(), the queue is thread-safe
+		passed = self.filter(record)
+		if passed:
+			self.emit(record)
+		# record.created is set when the LogRecord is instantiated
+		self.handling_time += time() - record.created
+		self.records += 1
+		return passed
+
+	def emit(self, record):
+		self.queue.put_nowait(record)
+
+	def overhead(self):
+		"""Return average time per record spent in the calling thread from
+		creation of the LogRecord until it is queued, in s. This includes the
+		filters, but not the caller lookup before record creation."""
+		if not self.records:
+			return 0.0
+		return self.handling_time / self.records
+
+
+class LogWriter(threading.Thread):
+	"""Background thread passing queued records on to the output handlers"""
+	_sentinel = None
+
+	def __init__(self, queue, handlers):
+		threading.Thread.__init__(self)
+		self.queue = queue
+		self.handlers = list(handlers)
+		self.daemon = True
+
+	def add_handler(self, handler):
+		"""Add an output handler. Safe to call while the writer is running."""
+		self.handlers = self.handlers + [handler]
+
+	def run(self):
+		while True:
+			record = self.queue.get()
+			if record is self._sentinel:
+				break
+			for handler in self.handlers:
+				if record.levelno >= handler.level:
+					handler.handle(record)
+
+	def stop(self):
+		"""Flush all pending records and stop the writer"""
+		self.queue.put(self._sentinel)
+		self.join(5)
+
+
+LOG_CONTEXT = threading.local()
 MY_FORMAT = "%(levelname)s\t%(message)s"
+LOGGER = logging.getLogger('styleguard')
 #Warning and above goes to stderr
 eh = logging.StreamHandler(sys.stderr)  # pylint: disable=C0103
 eh.setFormatter(logging.Formatter(MY_FORMAT))
 eh.setLevel(logging.WARNING)
+eh.addFilter(logging.Filter('styleguard'))
 # everything from Debug to Info goes to stdout
 sh = logging.StreamHandler(sys.stdout)  # pylint: disable=C0103
 sh.setFormatter(logging.Formatter(MY_FORMAT))
 sh.setLevel(logging.DEBUG)
+sh.addFilter(logging.Filter('styleguard'))
 sh.addFilter(LessThanLevelFilter(logging.WARNING))
-LOGGER.addHandler(eh)
-LOGGER.addHandler(sh)
+# All output is written by a background thread, fed through LOG_QUEUE
+LOG_QUEUE = Queue.Queue()
+QUEUE_HANDLER = QueueHandler(LOG_QUEUE)
+QUEUE_HANDLER.addFilter(ContextFilter())
+LOG_WRITER = LogWriter(LOG_QUEUE, [eh, sh])
+LOG_WRITER.start()
+atexit.register(LOG_WRITER.stop)
+logging.getLogger().addHandler(QUEUE_HANDLER)
 LOGGER.setLevel(cfg['logging_level'])
 
 logging.getLogger('github.Requester').setLevel(logging.INFO)
 MY_QUEUE = Queue.Queue()
-MY_DICT = dict(TOKEN='', OWNER_REPO='')
+MY_DICT = dict(TOKEN='', OWNER_REPO=(cfg['repo_git_url']
+									.rstrip('.git').split('github.com/')[1]))
+# Seconds since START_TIME at which startup milestones were reached
+STARTUP_METRICS = {}
+WORKER = None
+WORKER_LOCK = threading.Lock()
+HISTORY = RunHistory(os.path.abspath(os.path.join(os.getcwd(),
+					cfg['storage_dir'], cfg['history_file'])))
+atexit.register(HISTORY.stop)
 
 
 class PrHandler(threading.Thread):
@@ -61,6 +184,8 @@ class PrHandler(threading.Thread):
 		threading.Thread.__init__(self)
 		self.queue = MY_QUEUE
 		self.payload = None
+		# information about the current run, for the run history
+		self.run_info = {}
 		self.reporoot = os.getenv('OPENSHIFT_REPO_DIR', '')
 		# base directory:
 		self.basedir = os.path.abspath(os.path.join(os.getcwd(),
@@ -71,16 +196,26 @@ class PrHandler(threading.Thread):
 			os.mkdir(self.repodir)
 		if not os.path.exists(self.stylerdir):
 			os.mkdir(self.stylerdir)
-		LOGGER.debug('PATH: ' + os.getenv('PATH', 'unset'))
+		LOGGER.debug('PATH: %s', os.getenv('PATH', 'unset'))
+		self.api_github = None
+		# set once the credential and repo checks in run() have passed
+		self.ready = threading.Event()
+		self.daemon = True
+		self.start()
+
+	def initialize(self):
+		"""Verify credentials and local repo.
 
+		This runs in the worker thread, so that webhooks can be accepted and
+		queued while it is in progress"""
 		self.api_github = self.init_authentication()
 		if self.api_github == 1:
 			raise PRHandlerException('Initialization failed. Aborting.')
-		LOGGER.debug('Remaining Github API calls: ' +
-					str(self.api_github.rate_limiting[0]))
+		LOGGER.debug('Remaining Github API calls: %s',
+					self.api_github.rate_limiting[0])
 		if cfg['fetch_method'] == 'git':
 			if os.path.isdir(os.path.join(self.repodir, '.git')):
-				LOGGER.info('Local git repo at ' + str(self.repodir))
+				LOGGER.info('Local git repo at %s', self.repodir)
 			else:
 				raise PRHandlerException('Not a git repo directory: ' +
 										str(self.repodir))
@@ -88,40 +223,95 @@ class PrHandler(threading.Thread):
 			if git_command('status --porcelain', self.repodir, True, False):
 				raise PRHandlerException('Local git repo is dirty!' +
 										' Correct this first!')
-		MY_DICT['OWNER_REPO'] = (cfg['repo_git_url']
-										.rstrip('.git').split('github.com/')[1])
-		self.daemon = True
-		self.start()
 
 	def run(self):
+		delay = 5
+		while True:
+			try:
+				self.initialize()
+				break
+			except (PRHandlerException, IOError, ValueError, KeyError,
+					RequestException, github.GithubException) as exc:
+				LOGGER.critical('PR worker could not be initialized: %s', exc)
+				LOGGER.critical('Incoming PRs are queued. Retrying in %d s', delay)
+				sleep(delay)
+				delay = min(2 * delay, cfg['init_retry_max'])
+		self.ready.set()
+		record_startup('worker_ready')
 		while True:
 			LOGGER.info("Waiting in worker run()")
 #			LOGGER.debug('run self.queue id: ' + str(id(self.queue)))
 			self.payload = self.queue.get()
-			LOGGER.info(60 * '*')
-			LOGGER.info("Aquired new payload: PR " + str(self.payload["number"]))
-			LOGGER.info('UTC time: ' + str(datetime.utcnow()))
-			if self.validate_pr():
+			if type(self.payload) == int:
+				# manual check requests only carry the PR number
 				try:
-					filtered_files = self.get_pr()
-					result = self.check_style(filtered_files)
-					my_gist = None
-					if result['patch_file_name']:  # There's a patch file
-						my_gist = self.create_gist(result)
-					if not cfg['suppress_feedback']:
-						self.publish_results(result, my_gist)
-				except PRHandlerException as exc:
-					LOGGER.error('An error occured in the PR handler:' + str(exc))
-				finally:
-					# guarantee that clean up runs even if exceptions occur
-					self.clean_up()
-			else:
-				LOGGER.warning('Skipping PR ' + str(self.payload["number"]))
-			LOGGER.debug('Remaining Github API calls: ' +
-						str(self.api_github.rate_limiting[0]))
+					self.payload = fetch_payload(self.payload)
+				except (RequestException, IOError, ValueError) as exc:
+					LOGGER.error('Could not get payload of PR %s: %s',
+								self.payload, exc)
+					self.payload = None
+				if self.payload is None:
+					self.queue.task_done()
+					continue
+			LOG_CONTEXT.pr = self.payload["number"]
+			LOG_CONTEXT.durations = {}
+			self.run_info = {'pr_number': self.payload['number'],
+							'head_sha': self.payload['head']['sha'],
+							# bytes transferred by git fetch are unknown
+							'bytes_fetched': (None if cfg['fetch_method'] == 'git'
+											else 0),
+							'stage_durations': LOG_CONTEXT.durations}
+			start = time()
+			LOGGER.info(60 * '*')
+			LOGGER.info("Aquired new payload: PR %s", self.payload["number"])
+			LOGGER.info('UTC time: %s', datetime.utcnow())
+			try:
+				with log_stage('validate'):
+					valid = self.validate_pr()
+				if valid:
+					try:
+						with log_stage('fetch'):
+							filtered_files = self.get_pr()
+						with log_stage('style'):
+							result = self.check_style(filtered_files)
+						my_gist = None
+						if result['patch_file_name']:  # There's a patch file
+							with log_stage('gist'):
+								my_gist = self.create_gist(result)
+						if not cfg['suppress_feedback']:
+							with log_stage('publish'):
+								self.publish_results(result, my_gist)
+						if result['patch_file_name']:
+							self.run_info['outcome'] = 'patch'
+						else:
+							self.run_info['outcome'] = 'conforms'
+					except PRHandlerException as exc:
+						LOGGER.error('An error occured in the PR handler: %s', exc)
+						self.run_info['outcome'] = 'error'
+					finally:
+						# guarantee that clean up runs even if exceptions occur
+						with log_stage('clean_up'):
+							self.clean_up()
+				else:
+					LOGGER.warning('Skipping PR %s', self.payload["number"])
+					self.run_info['outcome'] = 'invalid'
+			except Exception as exc:  # pylint: disable=W0703
+				# keep the worker alive, and record the failed run
+				LOGGER.exception('Unexpected error in the PR handler: %s', exc)
+				self.run_info['outcome'] = 'error'
+			finally:
+				self.run_info['duration'] = time() - start
+				HISTORY.record(self.run_info)
+				LOG_CONTEXT.durations = None
+			LOGGER.debug('Remaining Github API calls: %s',
+						self.api_github.rate_limiting[0])
 			self.queue.task_done()
-			LOGGER.info("Finished processing payload PR " + str(self.payload["number"]))
-			LOGGER.debug("self.queue size: " + str(self.queue.qsize()))
+			LOGGER.info("Finished processing payload PR %s", self.payload["number"])
+			LOGGER.debug("self.queue size: %s", self.queue.qsize())
+			LOGGER.debug('Logging overhead from record creation to queue: ' +
+						'%.1f us per record over %d records',
+						QUEUE_HANDLER.overhead() * 1e6, QUEUE_HANDLER.records)
+			LOG_CONTEXT.pr = None
 
 	def init_authentication(self):
 		"""Create appropriate Github API user"""
@@ -132,15 +322,20 @@ class PrHandler(threading.Thread):
 			if all(scope in auths_temp['ofbot_codestyle_status']['scopes']
 					for scope in ['repo:status', 'gist']):
 				# Return authorized PyGithub Github API instance
-				gh_instance = github.Github(auths_temp['ofbot_codestyle_status']['token'])
-				# Verification of authentication
-				try:
-					_unused_var = gh_instance.get_user().name
-				except github.GithubException as exception:
-					# will throw 401 {u'message': u'Bad credentials'}
-					LOGGER.critical('Authentication invalid: ' +
-								str(exception.status) + " " + str(exception.data))
-					return 1
+				token = auths_temp['ofbot_codestyle_status']['token']
+				gh_instance = github.Github(token)
+				# Verification of authentication, skipped if recently done
+				if self.auth_cached(token):
+					LOGGER.info('Using cached verification of authentication')
+				else:
+					try:
+						_unused_var = gh_instance.get_user().name
+					except github.GithubException as exception:
+						# will throw 401 {u'message': u'Bad credentials'}
+						LOGGER.critical('Authentication invalid: %s %s',
+									exception.status, exception.data)
+						return 1
+					self.cache_auth(token)
 				MY_DICT['TOKEN'] = auths_temp['ofbot_codestyle_status']['token']
 				return gh_instance
 			else:
@@ -152,10 +347,25 @@ class PrHandler(threading.Thread):
 #			Wishlist: comment-style PR feedback
 #			return 1
 		else:
-			LOGGER.error("Unknown feedback method: " +
-							str(cfg['feedback_method']))
+			LOGGER.error("Unknown feedback method: %s", cfg['feedback_method'])
 			return 1
 
+	def auth_cached(self, token):
+		"""Return True if token has been verified within cfg['auth_cache_ttl']"""
+		try:
+			with open(os.path.join(self.basedir, 'auth_cache.json'), 'r') as cache:
+				cached = json.load(cache)
+		except (IOError, ValueError):
+			return False
+		return (cached.get('token_sha1') == sha1(token).hexdigest() and
+				time() - cached.get('verified', 0) < cfg['auth_cache_ttl'])
+
+	def cache_auth(self, token):
+		"""Store a successful verification of token"""
+		with open(os.path.join(self.basedir, 'auth_cache.json'), 'w') as cache:
+			json.dump({'token_sha1': sha1(token).hexdigest(),
+						'verified': time()}, cache)
+
 	def validate_pr(self):
 		"""Determine if the current PR is valid for processing"""
 		LOGGER.info('Verifying information from payload')
@@ -163,9 +373,9 @@ class PrHandler(threading.Thread):
 			verified = True
 		else:
 			verified = False
-			LOGGER.warning('PR git_url ' +
-							self.payload['base']['repo']['git_url'] +
-							' does not match config: ' + cfg['repo_git_url'])
+			LOGGER.warning('PR git_url %s does not match config: %s',
+							self.payload['base']['repo']['git_url'],
+							cfg['repo_git_url'])
 		if self.payload['state'] == 'open':
 			verified = verified and True
 		else:
@@ -195,12 +405,9 @@ class PrHandler(threading.Thread):
 			verified = verified and mergeable
 
 		if not verified:
-			LOGGER.warning('PR ' +
-							str(self.payload["number"]) +
-							' is not valid.')
+			LOGGER.warning('PR %s is not valid.', self.payload["number"])
 		else:
-			LOGGER.info('PR ' + str(self.payload["number"]) +
-						' is valid.')
+			LOGGER.info('PR %s is valid.', self.payload["number"])
 		return verified
 
 	def get_pr(self):
@@ -218,6 +425,8 @@ class PrHandler(threading.Thread):
 			filtered_file_list = self.filter_file_list(changed_files)
 		elif cfg['fetch_method'] == 'file':
 			changed_files, filtered_file_list = self.file_process_pr(api_pr)
+		self.run_info['files_changed'] = len(changed_files)
+		self.run_info['files_styled'] = len(filtered_file_list)
 
 		styler_files = ['scripts/dev/style/ofStyler',
 				'scripts/dev/style/openFrameworks_style.cfg',
@@ -249,11 +458,11 @@ class PrHandler(threading.Thread):
 		# my_remotes[remotes][name-url-(fetch/push)]
 		for rem in my_remotes:
 			if rem[2] == "(fetch)":
-				LOGGER.debug('Found remote ' + rem[0] + ': ' + rem[1])
+				LOGGER.debug('Found remote %s: %s', rem[0], rem[1])
 				if (rem[1] == self.payload['base']['repo']['git_url']
 				or rem[1] == self.payload['base']['repo']['ssh_url']):
 					base_remote = rem[0]
-					LOGGER.info('Base remote: ' + base_remote)
+					LOGGER.info('Base remote: %s', base_remote)
 		if base_remote is None:
 			raise PRHandlerException('Base remote does not exist yet, with URL ' +
 							self.payload['base']['repo']['git_url'] +
@@ -263,7 +472,7 @@ class PrHandler(threading.Thread):
 		LOGGER.info('Getting the base branch')
 		git_command('fetch ' + base_remote, self.repodir)
 		base_branch_name = self.payload['base']['ref']
-		LOGGER.debug('Base branch name: ' + base_branch_name)
+		LOGGER.debug('Base branch name: %s', base_branch_name)
 
 		if not git_command('show-ref --verify --heads --quiet -- refs/heads/' +
 				base_branch_name, self.repodir):
@@ -276,7 +485,7 @@ class PrHandler(threading.Thread):
 			git_command('checkout -b ' + base_branch_name + ' ' +
 					base_remote + '/' + base_branch_name, self.repodir)
 		git_command('submodule update --init', self.repodir)
-		LOGGER.info('Base branch at: ' +
+		LOGGER.info('Base branch at: %s',
 					git_command('log --pretty=format:"%h - %s" -n 1 HEAD',
 								self.repodir, True, False))
 
@@ -287,7 +496,7 @@ class PrHandler(threading.Thread):
 					'/head:' + pr_branch_name, self.repodir)
 		git_command('checkout ' + pr_branch_name, self.repodir)
 		git_command('submodule update --init', self.repodir)
-		LOGGER.info('PR branch at: ' +
+		LOGGER.info('PR branch at: %s',
 			git_command('log --pretty=format:"%h - %s" -n 1 HEAD',
 						self.repodir, True, False))
 
@@ -319,7 +528,7 @@ class PrHandler(threading.Thread):
 				changed_files.append(tmp_f.filename)
 				if self.filter_file_list([tmp_f.filename]):
 					filtered_files.append(tmp_f.filename)  # full path from repo root
-					LOGGER.debug('Fetching ' + tmp_f.filename)
+					LOGGER.debug('Fetching %s', tmp_f.filename)
 					resp = session.get(tmp_f.raw_url)
 					destination = os.path.join(self.repodir, tmp_f.filename)
 					try:
@@ -329,6 +538,7 @@ class PrHandler(threading.Thread):
 							raise
 					with open(destination, 'wb') as store_file:
 						store_file.write(resp.content)  # pylint: disable=E1103
+					self.run_info['bytes_fetched'] += len(resp.content)  # pylint: disable=E1103
 
 		LOGGER.info('Creating temporary git repository')
 		git_command('init', self.repodir)
@@ -351,10 +561,11 @@ class PrHandler(threading.Thread):
 			source_commit = api_pr.head.sha
 		else:
 			raise PRHandlerException('Unknown source: ' + source)
+		self.run_info['styler_sha'] = source_commit
 
 		# temporary workaround
 		for styler_file in styler_files:
-			LOGGER.debug('Fetching ' + styler_file)
+			LOGGER.debug('Fetching %s', styler_file)
 			# ATTENTION: For simplicity, any directories are stripped from styler_file!
 			destination = os.path.join(self.stylerdir, os.path.basename(styler_file))
 			try:
@@ -365,7 +576,10 @@ class PrHandler(threading.Thread):
 			with open(destination, 'wb') as filehandle:
 				content = api_repo.get_contents(styler_file, source_commit).content
 				encoding = api_repo.get_contents(styler_file, source_commit).encoding
-				filehandle.write(content.decode(encoding))
+				decoded = content.decode(encoding)
+				filehandle.write(decoded)
+				if self.run_info['bytes_fetched'] is not None:
+					self.run_info['bytes_fetched'] += len(decoded)
 			if styler_file.endswith('ofStyler'):
 				os.chmod(destination, os.stat(destination).st_mode | S_IEXEC)
 
@@ -403,7 +617,7 @@ class PrHandler(threading.Thread):
 		# check if styling changed any files
 		if git_command('status --porcelain', self.repodir, True, False):
 			patch_file_name = ('pr-' + str(pr_number) + '.patch')
-			LOGGER.info('Changes detected. Creating patch file ' + patch_file_name)
+			LOGGER.info('Changes detected. Creating patch file %s', patch_file_name)
 			with open(os.path.join(self.basedir, 'patches',
 									patch_file_name), 'w') as patchfile:
 				# OK to use git diff since only text files will be modified
@@ -416,7 +630,7 @@ class PrHandler(threading.Thread):
 				raise PRHandlerException('Patch' + patch_file_name +
 								' does not apply cleanly, aborting!')
 			else:
-				LOGGER.info('Patch ' + patch_file_name + ' applies cleanly')
+				LOGGER.info('Patch %s applies cleanly', patch_file_name)
 		else:
 			patch_file_name = ''
 			LOGGER.info("PR already conforms to style")
@@ -451,7 +665,7 @@ class PrHandler(threading.Thread):
 
 	def add_status(self, state, description, target_url=None):
 		"""Add the relevant codestyle information via a PR Status"""
-		LOGGER.info('Adding ' + state + ' Status to PR')
+		LOGGER.info('Adding %s Status to PR', state)
 		repo = self.api_github.get_repo(self.payload['base']['repo']['full_name'])
 		commit = repo.get_commit(self.payload['head']['sha'])
 		# State: success, failure, error, or pending
@@ -486,7 +700,7 @@ class PrHandler(threading.Thread):
 					{desc_file_name: github.InputFileContent(desc_string),
 					patch_file_name: github.InputFileContent(patchfile.read())},
 					'OF Code style patch for PR ' + str(result['pr_number']))
-		LOGGER.info('Created Gist ' + my_gist.html_url)
+		LOGGER.info('Created Gist %s', my_gist.html_url)
 		return my_gist
 
 	def clean_up(self):
@@ -521,18 +735,17 @@ def git_command(arg_string, repo_dir, return_output=False, log_output=True):
 		output = subprocess.check_output(shlex.split(cmd_prefix + 'git ' +
 													arg_string),
 										stderr=subprocess.STDOUT, cwd=repo_dir)
-		if output and log_output:
-			LOGGER.debug(str(output).rstrip('\n'))
+		if output and log_output and LOGGER.isEnabledFor(logging.DEBUG):
+			LOGGER.debug('%s', truncate_output(str(output).rstrip('\n')))
 		if return_output:
 			return str(output)
 	except subprocess.CalledProcessError as exc:
 		if log_output:
-			LOGGER.error(str(exc.cmd) + ' failed with exit status ' +
-						str(exc.returncode) + ':')
+			LOGGER.error('%s failed with exit status %s:', exc.cmd, exc.returncode)
 			if hasattr(exc, 'output'):
-				LOGGER.error(exc.output)
+				LOGGER.error('%s', truncate_output(exc.output))
 			else:
-				LOGGER.error(str(exc))
+				LOGGER.error('%s', exc)
 		if return_output:
 			if hasattr(exc, 'output'):
 				return exc.output
@@ -549,42 +762,86 @@ def style_file(my_file, style_tool_dir):
 		output = subprocess.check_output(shlex.split(('.' + os.path.sep +
 													'ofStyler ' + my_file).encode('ascii')),
 										stderr=subprocess.STDOUT, cwd=style_tool_dir)
-		if output:
-			LOGGER.debug(str(output).rstrip('\n'))
+		if output and LOGGER.isEnabledFor(logging.DEBUG):
+			LOGGER.debug('%s', truncate_output(str(output).rstrip('\n')))
 	except subprocess.CalledProcessError as exc:
-		LOGGER.error(str(exc.cmd) + ' failed with exit status ' +
-					str(exc.returncode) + ':')
+		LOGGER.error('%s failed with exit status %s:', exc.cmd, exc.returncode)
 		if hasattr(exc, 'output'):
-			LOGGER.error(exc.output)
+			LOGGER.error('%s', truncate_output(exc.output))
 		else:
-			LOGGER.error(str(exc))
+			LOGGER.error('%s', exc)
+
+
+def fetch_payload(pr_number):
+	"""Get the payload data of a PR from the Github API.
+
+	Return the payload dict, or None if this failed"""
+	parameters = {'access_token': MY_DICT['TOKEN']}
+	# GET /repos/:owner/:repo/pulls/:number
+	url = ('https://api.github.com/repos/' + MY_DICT['OWNER_REPO'] +
+			'/pulls/' + str(pr_number))
+	req = get(url, params=parameters)
+	if not req.ok:
+		LOGGER.error('An error occured getting the PR payload data: %s',
+					req.text)
+		return None
+	return req.json()
+
+
+def start_worker():
+	"""Start the PR worker thread, unless it is already running.
+	A worker which has died is replaced.
+
+	Return the PrHandler instance"""
+	global WORKER  # pylint: disable=W0603
+	with WORKER_LOCK:
+		if WORKER is None or not WORKER.is_alive():
+			if WORKER is not None:
+				LOGGER.error('PR worker thread has died, starting a new one')
+			WORKER = PrHandler()
+	return WORKER
+
+
+def worker_status():
+	"""Return a dict describing the state of the PR worker"""
+	alive = WORKER is not None and WORKER.is_alive()
+	return {'worker_ready': alive and WORKER.ready.is_set(),
+			'alive': alive,
+			'queue_size': MY_QUEUE.qsize(),
+			'startup_seconds': STARTUP_METRICS}
+
+
+def set_start_time(start_time):
+	"""Measure startup milestones from start_time instead of the import of
+	this module, e.g. to include the setup done by the WSGI entry point"""
+	global START_TIME  # pylint: disable=W0603
+	START_TIME = start_time
+
+
+def record_startup(milestone):
+	"""Record the time since START_TIME at which a startup milestone was reached"""
+	elapsed = time() - START_TIME
+	STARTUP_METRICS[milestone] = elapsed
+	LOGGER.info('Startup: %s after %.3f s', milestone, elapsed,
+				extra={'stage': 'startup', 'duration': elapsed})
 
 
 def handle_payload(payload):
 	"""	Queue new PRs coming in during processing"""
+	start_worker()
 	if type(payload) == int:
-		parameters = {'access_token': MY_DICT['TOKEN']}
-		# GET /repos/:owner/:repo/pulls/:number
-		url = ('https://api.github.com/repos/' + MY_DICT['OWNER_REPO'] +
-				'/pulls/' + str(payload))
-		req = get(url, params=parameters)
-		if not req.ok:
-			LOGGER.error('An error occured getting the PR payload data: ' +
-						req.text)
-		else:
-			payload = req.json()
-			LOGGER.debug("handing payload off to queue")
-			MY_QUEUE.put(payload)
+		# the payload data is fetched by the worker, to answer quickly
+		LOGGER.debug("handing PR number off to queue")
+		MY_QUEUE.put(payload)
 	elif type(payload) == dict:
-		LOGGER.info('Received PR ' + str(payload['number']) + ': ' +
-					payload['title'])
+		LOGGER.info('Received PR %s: %s', payload['number'], payload['title'])
 		basedir = os.path.abspath(os.path.join(os.getcwd(), cfg['storage_dir']))
 		with open(os.path.join(basedir, 'last_payload.json'), 'w') as outfile:
 			json.dump(payload, outfile, indent=2)
 		LOGGER.debug("handing payload off to queue")
 		MY_QUEUE.put(payload)
 	else:
-		LOGGER.error('Unknown type of payload: ' + str(type(payload)))
+		LOGGER.error('Unknown type of payload: %s', type(payload))
 
 
 def add_file_logger():
@@ -598,6 +855,38 @@ def add_file_logger():
 		# Add file logger. Rotate every midnight, keep 14 days of files
 		filehandler = TimedRotatingFileHandler(logfile, when='midnight',
 			backupCount=14, utc=True)
-		filehandler.setFormatter(logging.Formatter(MY_FORMAT))
-		root_logger = logging.getLogger()
-		root_logger.addHandler(filehandler)
+		if cfg.get('log_json'):
+			# one JSON object per line, with PR number, stage and duration
+			filehandler.setFormatter(JsonFormatter())
+		else:
+			filehandler.setFormatter(logging.Formatter(MY_FORMAT))
+		# the file is written by the background log writer thread
+		LOG_WRITER.add_handler(filehandler)
+
+
+@contextmanager
+def log_stage(stage):
+	"""Tag log records with the current processing stage and log its duration.
+
+	Durations are also added to LOG_CONTEXT.durations, if set"""
+	LOG_CONTEXT.stage = stage
+	start = time()
+	try:
+		yield
+	finally:
+		duration = time() - start
+		durations = getattr(LOG_CONTEXT, 'durations', None)
+		if durations is not None:
+			durations[stage] = durations.get(stage, 0) + duration
+		LOGGER.info('Stage %s took %.3f s', stage, duration,
+					extra={'duration': duration})
+		LOG_CONTEXT.stage = None
+
+
+def truncate_output(output):
+	"""Cap captured subprocess output to cfg['log_output_limit'] characters"""
+	limit = cfg.get('log_output_limit')
+	if not limit or len(output) <= limit:
+		return output
+	return (output[:limit] + '\n[... ' + str(len(output) - limit) +
+			' more characters truncated]')
@@ -15,7 +15,12 @@ cfg = dict(  # pylint: disable=C0103
 	suppress_feedback=False,  # only create gists, don't affect the checked PR
 	logging_level=logging.DEBUG,  # DEBUG/INFO/WARNING/ERROR/CRITICAL,
 	logfile='ofCodeStyleGuard.log',
+	log_json=False,  # write the logfile as JSON lines (pr, stage, duration)
+	log_output_limit=4000,  # max. characters of logged subprocess output
 	authfile='auths.json',
+	history_file='history.sqlite',  # run history database, in storage_dir
+	auth_cache_ttl=24 * 3600,  # seconds to trust a previous auth verification
+	init_retry_max=300,  # max. seconds between worker initialization attempts
 #
 #	Web server configuration:
 	local_port=os.getenv('OPENSHIFT_INTERNAL_PORT', 4896),
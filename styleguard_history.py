@@ -0,0 +1,146 @@
+"""Persistent record of PR handler runs, with latency statistics."""
+
+import logging
+import json
+import math
+import threading
+import sqlite3
+import Queue
+from time import time
+
+LOGGER = logging.getLogger('styleguard.history')
+
+COLUMNS = ['finished', 'pr_number', 'head_sha', 'styler_sha', 'outcome',
+			'files_changed', 'files_styled', 'bytes_fetched', 'duration',
+			'stage_durations']
+SCHEMA = """CREATE TABLE IF NOT EXISTS runs (
+	id INTEGER PRIMARY KEY,
+	finished REAL NOT NULL,
+	pr_number INTEGER,
+	head_sha TEXT,
+	styler_sha TEXT,
+	outcome TEXT,
+	files_changed INTEGER,
+	files_styled INTEGER,
+	bytes_fetched INTEGER,
+	duration REAL,
+	stage_durations TEXT)"""
+
+
+class RunHistory(threading.Thread):
+	"""Store one row per PR handler run in an sqlite database.
+
+	Rows are queued by record() and written in batches by this thread, so
+	that the PR worker does not wait for the disk."""
+	_sentinel = None
+
+	def __init__(self, db_file, batch_size=20, flush_interval=5.0):
+		threading.Thread.__init__(self)
+		self.db_file = db_file
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self.queue = Queue.Queue()
+		self.lock = threading.Lock()
+		self.daemon = True
+
+	def _connect(self):
+		"""Return a new database connection. Connections can't be shared
+		between threads."""
+		conn = sqlite3.connect(self.db_file)
+		conn.execute(SCHEMA)
+		conn.execute('CREATE INDEX IF NOT EXISTS runs_finished ON runs (finished)')
+		return conn
+
+	def record(self, run):
+		"""Queue a dict with (some of) the COLUMNS for writing"""
+		with self.lock:
+			if self.ident is None:  # not started yet
+				self.start()
+		row = dict((column, run.get(column)) for column in COLUMNS)
+		row['finished'] = row['finished'] or time()
+		row['stage_durations'] = json.dumps(run.get('stage_durations', {}))
+		self.queue.put(row)
+
+	def run(self):
+		conn = self._connect()
+		batch = []
+		deadline = None
+		while True:
+			timeout = None
+			if batch:
+				timeout = max(deadline - time(), 0)
+			try:
+				row = self.queue.get(True, timeout)
+			except Queue.Empty:
+				row = False
+			if row is self._sentinel:
+				self._write(conn, batch)
+				break
+			if row:
+				if not batch:
+					deadline = time() + self.flush_interval
+				batch.append(row)
+			if batch and (len(batch) >= self.batch_size or time() >= deadline):
+				self._write(conn, batch)
+				batch = []
+		conn.close()
+
+	def _write(self, conn, batch):
+		"""Write a batch of rows in one transaction"""
+		if not batch:
+			return
+		statement = ('INSERT INTO runs (' + ', '.join(COLUMNS) + ') VALUES (' +
+					', '.join('?' * len(COLUMNS)) + ')')
+		try:
+			with conn:
+				conn.executemany(statement, [[row[column] for column in COLUMNS]
+											for row in batch])
+			LOGGER.debug('Wrote %d runs to history', len(batch))
+		except sqlite3.Error as exc:
+			LOGGER.error('Could not write %d runs to history: %s', len(batch), exc)
+
+	def stop(self):
+		"""Write all pending rows and stop the writer"""
+		if self.is_alive():
+			self.queue.put(self._sentinel)
+			self.join(5)
+
+	def stats(self, window):
+		"""Return latency percentiles and throughput of runs finished within
+		the last window seconds. Runs not yet written are not included."""
+		since = time() - window
+		conn = self._connect()
+		try:
+			rows = conn.execute('SELECT outcome, duration, stage_durations ' +
+								'FROM runs WHERE finished >= ?', (since,)).fetchall()
+		finally:
+			conn.close()
+		outcomes = {}
+		durations = []
+		stages = {}
+		for outcome, duration, stage_durations in rows:
+			outcomes[outcome] = outcomes.get(outcome, 0) + 1
+			if duration is not None:
+				durations.append(duration)
+			for stage, value in json.loads(stage_durations or '{}').items():
+				stages.setdefault(stage, []).append(value)
+		return {'window_seconds': window,
+				'runs': len(rows),
+				'runs_per_hour': len(rows) * 3600.0 / window,
+				'outcomes': outcomes,
+				'duration': percentiles(durations),
+				'stages': dict((stage, percentiles(values))
+							for stage, values in stages.items())}
+
+
+def percentiles(values):
+	"""Return nearest-rank p50, p95 and p99 of a list of numbers"""
+	values = sorted(values)
+	result = {}
+	for name, fraction in [('p50', 0.5), ('p95', 0.95), ('p99', 0.99)]:
+		if values:
+			index = int(math.ceil(fraction * len(values))) - 1
+			result[name] = values[max(index, 0)]
+		else:
+			result[name] = None
+	return result